@@ -3,11 +3,12 @@
 ## Setup
 import cv2
 import argparse
-import math
 import os
 import matplotlib.pyplot as plt
 import numpy as np
 from output_modules import OutputCreator, Progress
+from climb_library import landmarksToArray
+from metric_kernels import MetricTracker, NUM_METRICS, RIGHT_ARM, LEFT_ARM, RIGHT_LEG, LEFT_LEG, RIGHT_HAND, LEFT_HAND, RIGHT_FOOT, LEFT_FOOT
 
 # create argument parser
 ap = argparse.ArgumentParser()
@@ -28,6 +29,7 @@ detector = oc.get_detector()
 
 ## Get frames for image and plot
 cap = cv2.VideoCapture(args['video']) 
+fps = cap.get(cv2.CAP_PROP_FPS) or 30
 numframes, imgframes, plotframes = oc.create_frames(cap)
 cap.release()
 
@@ -46,72 +48,35 @@ for im in imgframes:
 pb.finish()
 
 
+## Update every metric frame by frame
+pb.newTimer('Calculating Metrics: ', numframes)
+pb.start()
+worldframes = landmarksToArray(lmlist).astype(np.float64)
+pixelframes = landmarksToArray(imglmlist)[:, :, :2].astype(np.float64)
+tracker = MetricTracker(fps, int(args['smooth']))
+metrics = np.zeros((numframes, NUM_METRICS))
+cogs = np.zeros((numframes, 2), dtype=int)
+for i in range(numframes):
+    metrics[i], cogs[i] = tracker.update(worldframes[i], pixelframes[i])
+    pb.update(i+1)
+pb.finish()
+
+
 ## Arm and leg extension
 def limbExtension():
     pb.newTimer('Calculating Limb Extension Values: ', numframes)
     pb.start()
-    raextension = []
-    laextension = []
-    rlextension = []
-    llextension = []
-    raextensionMA = []
-    laextensionMA = []
-    rlextensionMA = []
-    llextensionMA = []
     armExtensionFrames = [None] * numframes
     legExtensionFrames = [None] * numframes
-    i=0
-    for lm in lmlist:
-        if lm != []:
-            # Right arm
-            rshoulder = lm[12]
-            rhand = lm[16]
-            raextension.append(math.sqrt((rshoulder[1] - rhand[1])**2 + (rshoulder[2] - rhand[2])**2 + (rshoulder[3] - rhand[3])**2))
-            # Left arm
-            lshoulder = lm[11]
-            lhand = lm[15]
-            laextension.append(math.sqrt((lshoulder[1] - lhand[1])**2 + (lshoulder[2] - lhand[2])**2 + (lshoulder[3] - lhand[3])**2))
-            # Right leg
-            rleg = lm[24]
-            rfoot = lm[28]
-            rlextension.append(math.sqrt((rleg[1] - rfoot[1])**2 + (rleg[2] - rfoot[2])**2 + (rleg[3] - rfoot[3])**2))
-            # Left leg
-            lleg = lm[23]
-            lfoot = lm[27]
-            llextension.append(math.sqrt((lleg[1] - lfoot[1])**2 + (lleg[2] - lfoot[2])**2 + (lleg[3] - lfoot[3])**2))
-        else:
-            if i != 0:
-                raextension.append(raextension[i-1])
-                laextension.append(laextension[i-1])
-                rlextension.append(rlextension[i-1])
-                llextension.append(llextension[i-1])
-            else:
-                raextension.append(0)
-                laextension.append(0)
-                rlextension.append(0)
-                llextension.append(0)
-
-        # smoothing function
-        windowSize = int(args['smooth'])
-        if i < windowSize:
-            raextensionMA.append(raextension[i])
-            laextensionMA.append(laextension[i])
-            rlextensionMA.append(rlextension[i])
-            llextensionMA.append(llextension[i])
-        else:
-            raextensionMA.append(sum(raextension[i-windowSize : i])/windowSize)
-            laextensionMA.append(sum(laextension[i-windowSize : i])/windowSize)
-            rlextensionMA.append(sum(rlextension[i-windowSize : i])/windowSize)
-            llextensionMA.append(sum(llextension[i-windowSize : i])/windowSize)
-
+    for i in range(numframes):
         # leg extension plot
         fig = plt.figure()
         ax = plt.axes()
         plt.title("Leg Extension")
         plt.ylim(0, 1)
         x = np.linspace(0, i+1, i+1)
-        ax.plot(x, rlextensionMA, label='Right Leg')
-        ax.plot(x, llextensionMA, label='Left Leg')
+        ax.plot(x, metrics[:i+1, RIGHT_LEG], label='Right Leg')
+        ax.plot(x, metrics[:i+1, LEFT_LEG], label='Left Leg')
         plt.legend()
         fig.canvas.draw()
         extframe = np.frombuffer(fig.canvas.tostring_rgb(), dtype=np.uint8)
@@ -125,17 +90,16 @@ def limbExtension():
         plt.title("Arm Extension")
         plt.ylim(0, 1)
         x = np.linspace(0, i+1, i+1)
-        ax.plot(x, raextensionMA, label='Right Arm')
-        ax.plot(x, laextensionMA, label='Left Arm')
+        ax.plot(x, metrics[:i+1, RIGHT_ARM], label='Right Arm')
+        ax.plot(x, metrics[:i+1, LEFT_ARM], label='Left Arm')
         plt.legend()
         fig.canvas.draw()
         extframe = np.frombuffer(fig.canvas.tostring_rgb(), dtype=np.uint8)
         extframe = extframe.reshape(fig.canvas.get_width_height()[::-1] + (3,))
         armExtensionFrames[i] = extframe
         plt.close()
-        
-        i+=1
-        pb.update(i)
+
+        pb.update(i+1)
     pb.finish()
 
     return armExtensionFrames, legExtensionFrames
@@ -145,55 +109,17 @@ def limbExtension():
 def HFvelo():
     pb.newTimer('Calculating Hand and Foot Velocity Values: ', numframes)
     pb.start()
-    rhvelo = []
-    lhvelo = []
-    rfvelo = []
-    lfvelo = []
-    rhveloMA = []
-    lhveloMA = []
-    rfveloMA = []
-    lfveloMA = []
     handVeloFrames = [None] * numframes
     footVeloFrames = [None] * numframes
     for i in range(numframes):
-        if imglmlist[i] != [] and i != 0:
-            rhvelo.append(math.sqrt((imglmlist[i][20][1]-imglmlist[i-1][20][1])**2 + (imglmlist[i][20][2]-imglmlist[i-1][20][2])**2)*30)
-            lhvelo.append(math.sqrt((imglmlist[i][19][1]-imglmlist[i-1][19][1])**2 + (imglmlist[i][19][2]-imglmlist[i-1][19][2])**2)*30)
-            rfvelo.append(math.sqrt((imglmlist[i][32][1]-imglmlist[i-1][32][1])**2 + (imglmlist[i][32][2]-imglmlist[i-1][32][2])**2)*30)
-            lfvelo.append(math.sqrt((imglmlist[i][31][1]-imglmlist[i-1][31][1])**2 + (imglmlist[i][31][2]-imglmlist[i-1][31][2])**2)*30)
-        else:
-            if i != 0:
-                rhvelo.append(rhvelo[i-1])
-                lhvelo.append(lhvelo[i-1])
-                rfvelo.append(rfvelo[i-1])
-                lfvelo.append(lfvelo[i-1])
-            else:
-                rhvelo.append(0)
-                lhvelo.append(0)
-                rfvelo.append(0)
-                lfvelo.append(0)
-
-        # smoothing function
-        windowSize = int(args['smooth'])
-        if i < windowSize:
-            rhveloMA.append(rhvelo[i])
-            lhveloMA.append(lhvelo[i])
-            rfveloMA.append(rfvelo[i])
-            lfveloMA.append(lfvelo[i])
-        else:
-            rhveloMA.append(sum(rhvelo[i-windowSize : i])/windowSize)
-            lhveloMA.append(sum(lhvelo[i-windowSize : i])/windowSize)
-            rfveloMA.append(sum(rfvelo[i-windowSize : i])/windowSize)
-            lfveloMA.append(sum(lfvelo[i-windowSize : i])/windowSize)
-
         # hand velocity plot
         fig = plt.figure()
         ax = plt.axes()
         plt.title("Arm Velocity")
         plt.ylim(0, 1000)
         x = np.linspace(0, i+1, i+1)
-        ax.plot(x, rhveloMA, label='Right Hand')
-        ax.plot(x, lhveloMA, label='Left Hand')
+        ax.plot(x, metrics[:i+1, RIGHT_HAND], label='Right Hand')
+        ax.plot(x, metrics[:i+1, LEFT_HAND], label='Left Hand')
         plt.legend()
         fig.canvas.draw()
         extframe = np.frombuffer(fig.canvas.tostring_rgb(), dtype=np.uint8)
@@ -207,8 +133,8 @@ def HFvelo():
         plt.title("Foot Velocity")
         plt.ylim(0, 1000)
         x = np.linspace(0, i+1, i+1)
-        ax.plot(x, rfveloMA, label='Right Foot')
-        ax.plot(x, lfveloMA, label='Left Foot')
+        ax.plot(x, metrics[:i+1, RIGHT_FOOT], label='Right Foot')
+        ax.plot(x, metrics[:i+1, LEFT_FOOT], label='Left Foot')
         plt.legend()
         fig.canvas.draw()
         extframe = np.frombuffer(fig.canvas.tostring_rgb(), dtype=np.uint8)
@@ -229,13 +155,7 @@ def COGline():
     cogFrames = imgframes.copy()
     for i in range(numframes):
         if imglmlist[i] != []:
-            rhip = imglmlist[i][24]
-            lhip = imglmlist[i][23]
-            rshoulder = imglmlist[i][12]
-            lshoulder = imglmlist[i][11]
-            centerShoulder = (abs(rshoulder[1]-lshoulder[1])/2 + min(rshoulder[1], lshoulder[1]), abs(rshoulder[2]-lshoulder[2])/2 + min(rshoulder[2], lshoulder[2]))
-            centerHips = (abs(rhip[1]-lhip[1])/2 + min(rhip[1], lhip[1]), abs(rhip[2]-lhip[2])/2 + min(rhip[2], lhip[2]))
-            centerGravity = (int((centerShoulder[0]+centerHips[0])/2), int((centerShoulder[1]+centerHips[1])/2))
+            centerGravity = (int(cogs[i][0]), int(cogs[i][1]))
             # draw downward line and circle at COG
             cogFrames[i] = cv2.circle(cv2.line(cv2.line(cogFrames[i].copy(), centerGravity, (centerGravity[0], imgframes[0].shape[0]), (12, 199, 6), 10), centerGravity, (centerGravity[0], 0), (255, 255, 255), 3), centerGravity, radius=10, color=(199, 6, 6), thickness=-1)
     pb.finish()
@@ -249,7 +169,6 @@ if args['cog'] == True: cogframes = COGline()
 
 
 ## Output videos
-fps = 30
 baseVideoNum = 2
 if args['draw'] == True: baseVideoNum += 1
 if args['limbex'] == True: baseVideoNum += 2
@@ -261,6 +180,9 @@ a=0
 pb.start()
 os.mkdir(f'./video_output/{args["name"]}')
 
+# save landmarks so the climb can be added to the climb library
+np.save(f'./video_output/{args["name"]}/landmarks.npy', landmarksToArray(lmlist))
+
 # create plot video
 h, w = plotframes[0].shape[:2]
 out = cv2.VideoWriter(f'./video_output/{args["name"]}/plot.mp4', cv2.VideoWriter_fourcc(*'mp4v'), fps, (w,h))
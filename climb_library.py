@@ -0,0 +1,244 @@
+### Indexed library of analysed climbs for movement similarity search
+
+## Setup
+import os
+import json
+import numpy as np
+
+# mediapipe ids of the limb joints used for the pose features
+# (shoulders, elbows, wrists, hips, knees, ankles)
+FEATURE_LANDMARKS = [11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28]
+NUM_LANDMARKS = 33
+
+def landmarksToArray(lmlist):
+    """
+    Converts a list of findRelativePosition outputs into an array
+
+    Parameters
+    ----------
+    lmlist : list
+        one findRelativePosition result per frame, [] when no pose was found
+
+    Output
+    ------
+    landmarks : numpy.ndarray
+        (numframes, 33, 3) array of world coordinates, nan for frames without a pose
+    """
+    landmarks = np.full((len(lmlist), NUM_LANDMARKS, 3), np.nan, dtype=np.float32)
+    for i, lm in enumerate(lmlist):
+        if lm != []:
+            landmarks[i] = np.asarray(lm, dtype=np.float32)[:, 1:4]
+    return landmarks
+
+def poseFeatures(landmarks, length=32):
+    """
+    Turns a landmark series into a normalized, fixed length feature sequence
+
+    Poses are centered on the hip midpoint and scaled by the torso length so
+    climbers of different sizes and positions on the wall can be compared.
+
+    Parameters
+    ----------
+    landmarks : numpy.ndarray
+        (numframes, 33, 3) array from landmarksToArray
+    length : int
+        number of frames to resample the sequence to (default=32)
+
+    Output
+    ------
+    features : numpy.ndarray
+        (length, len(FEATURE_LANDMARKS)*3) float32 array
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    found = ~np.isnan(landmarks).any(axis=(1, 2))
+    if not found.any():
+        return np.zeros((length, len(FEATURE_LANDMARKS)*3), dtype=np.float32)
+
+    # fill frames without a pose with the closest earlier frame (or the first found frame)
+    idx = np.where(found, np.arange(len(landmarks)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    idx[:np.argmax(found)] = np.argmax(found)
+    landmarks = landmarks[idx]
+
+    # center on hips and scale by torso length
+    centerHips = (landmarks[:, 23] + landmarks[:, 24]) / 2
+    centerShoulder = (landmarks[:, 11] + landmarks[:, 12]) / 2
+    torso = np.linalg.norm(centerShoulder - centerHips, axis=1).mean()
+    pose = (landmarks[:, FEATURE_LANDMARKS] - centerHips[:, None]) / max(torso, 1e-6)
+    pose = pose.reshape(len(pose), -1)
+
+    # resample to a fixed number of frames
+    t = np.linspace(0, len(pose)-1, length)
+    lo = np.floor(t).astype(int)
+    hi = np.minimum(lo+1, len(pose)-1)
+    frac = (t - lo)[:, None]
+    return ((1-frac)*pose[lo] + frac*pose[hi]).astype(np.float32)
+
+def lbKeogh(query, candidates, window):
+    """
+    Lower bound of the DTW distance between a query and many candidates
+
+    Parameters
+    ----------
+    query : numpy.ndarray
+        (length, dims) feature sequence
+    candidates : numpy.ndarray
+        (n, length, dims) feature sequences
+    window : int
+        Sakoe-Chiba warping window in frames
+
+    Output
+    ------
+    lb : numpy.ndarray
+        (n,) lower bounds, never greater than dtwDistance
+    """
+    length = len(query)
+    upper = np.empty_like(query)
+    lower = np.empty_like(query)
+    for i in range(length):
+        upper[i] = query[max(0, i-window) : i+window+1].max(axis=0)
+        lower[i] = query[max(0, i-window) : i+window+1].min(axis=0)
+    excess = np.maximum(candidates - upper, 0) + np.maximum(lower - candidates, 0)
+    return np.sqrt((excess**2).sum(axis=2)).sum(axis=1)
+
+def dtwDistance(a, b, window, bestSoFar=np.inf):
+    """
+    Dynamic time warping distance between two feature sequences
+
+    Parameters
+    ----------
+    a, b : numpy.ndarray
+        (length, dims) feature sequences
+    window : int
+        Sakoe-Chiba warping window in frames
+    bestSoFar : float
+        stop early once every path is worse than this (default=inf)
+
+    Output
+    ------
+    dist : float
+        DTW distance, inf if abandoned early
+    """
+    cost = np.sqrt(((a[:, None] - b[None])**2).sum(axis=2))
+    n, m = cost.shape
+    acc = np.full((n+1, m+1), np.inf)
+    acc[0, 0] = 0
+    for i in range(1, n+1):
+        for j in range(max(1, i-window), min(m, i+window)+1):
+            acc[i, j] = cost[i-1, j-1] + min(acc[i-1, j], acc[i, j-1], acc[i-1, j-1])
+        if acc[i].min() >= bestSoFar:
+            return np.inf
+    return acc[n, m]
+
+class ClimbLibrary:
+    """
+    On-disk index of climbs that can be searched for similar movement
+
+    Attributes
+    ----------
+    path : str
+        directory the index is stored in
+    length : int
+        number of frames each climb is resampled to (default=32)
+    """
+    def __init__(self, path, length=32):
+        self.path = path
+        self.length = length
+        self.names = []
+        self.features = np.zeros((0, length*len(FEATURE_LANDMARKS)*3), dtype=np.float32)
+        self.newFeatures = []
+
+        # load existing index, memory mapped so big libraries open instantly
+        if os.path.exists(os.path.join(path, 'features.npy')):
+            with open(os.path.join(path, 'names.json')) as f:
+                info = json.load(f)
+            self.length = info['length']
+            self.names = info['names']
+            self.features = np.load(os.path.join(path, 'features.npy'), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.names)
+
+    def clear(self):
+        """Remove every climb from the library (written on the next save)"""
+        self.names = []
+        self.features = np.zeros((0, self.length*len(FEATURE_LANDMARKS)*3), dtype=np.float32)
+        self.newFeatures = []
+
+    def add(self, name, landmarks):
+        """
+        Add a climb to the library
+
+        Parameters
+        ----------
+        name : str
+            name of the climb (e.g. the video_output directory name)
+        landmarks : numpy.ndarray
+            (numframes, 33, 3) array from landmarksToArray
+        """
+        self.names.append(name)
+        self.newFeatures.append(poseFeatures(landmarks, self.length).ravel())
+
+    def save(self):
+        """Write the index to disk"""
+        # copy out of the memory map before the file underneath it is overwritten
+        self.features = np.array(self.features)
+        if self.newFeatures:
+            self.features = np.concatenate([self.features, np.stack(self.newFeatures)])
+            self.newFeatures = []
+        os.makedirs(self.path, exist_ok=True)
+        np.save(os.path.join(self.path, 'features.npy'), self.features)
+        with open(os.path.join(self.path, 'names.json'), 'w') as f:
+            json.dump({'length': self.length, 'names': self.names}, f)
+        self.features = np.load(os.path.join(self.path, 'features.npy'), mmap_mode='r')
+
+    def query(self, landmarks, k=5, rerank=True, candidates=50, window=4):
+        """
+        Find the climbs with movement most similar to a landmark series
+
+        Parameters
+        ----------
+        landmarks : numpy.ndarray
+            (numframes, 33, 3) array from landmarksToArray
+        k : int
+            number of results to return (default=5)
+        rerank : bool
+            re-rank the nearest neighbours with DTW (default=True)
+        candidates : int
+            number of nearest neighbours to re-rank (default=50)
+        window : int
+            DTW warping window in frames (default=4)
+
+        Output
+        ------
+        results : list of (name, distance) tuples, closest first
+        """
+        if self.newFeatures:
+            self.save()
+        if len(self) == 0:
+            return []
+        q = poseFeatures(landmarks, self.length)
+
+        # vectorized euclidean nearest neighbours over the whole library
+        features = np.asarray(self.features)
+        dists = np.einsum('ij,ij->i', features, features) - 2*features.dot(q.ravel()) + q.ravel().dot(q.ravel())
+        dists = np.sqrt(np.maximum(dists, 0))
+        n = min(candidates if rerank else k, len(dists))
+        nearest = np.argpartition(dists, n-1)[:n]
+        nearest = nearest[np.argsort(dists[nearest])]
+        if not rerank:
+            return [(self.names[i], float(dists[i])) for i in nearest[:k]]
+
+        # DTW re-ranking, skipping candidates whose lower bound can't make the top k
+        seqs = features[nearest].reshape(n, self.length, -1)
+        lb = lbKeogh(q, seqs, window)
+        results = []
+        for c in np.argsort(lb):
+            kth = results[k-1][1] if len(results) >= k else np.inf
+            if lb[c] >= kth:
+                break
+            dist = dtwDistance(q, seqs[c], window, kth)
+            if dist < kth:
+                results.append((self.names[nearest[c]], float(dist)))
+                results.sort(key=lambda r: r[1])
+        return results[:k]
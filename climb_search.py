@@ -0,0 +1,37 @@
+### Build the climb library and search it for similar movement
+
+## Setup
+import os
+import argparse
+import numpy as np
+from climb_library import ClimbLibrary
+
+# create argument parser
+ap = argparse.ArgumentParser()
+ap.add_argument('-q', '--query', required=True, help='name of the climb in video_output to search with')
+ap.add_argument('-i', '--index', required=False, default='./climb_index', help='directory of the climb library')
+ap.add_argument('-b', '--build', required=False, default=False, action='store_true', help='rebuild the library from video_output')
+ap.add_argument('-k', '--results', required=False, default=5, help='number of similar climbs to show')
+ap.add_argument('-r', '--rerank', required=False, default=True, help='re-rank results with dynamic time warping')
+args = vars(ap.parse_args())
+
+
+## Build the library from every analysed climb
+if args['build'] or not os.path.exists(os.path.join(args['index'], 'features.npy')):
+    library = ClimbLibrary(args['index'])
+    library.clear()
+    for name in sorted(os.listdir('./video_output')):
+        path = f'./video_output/{name}/landmarks.npy'
+        if os.path.exists(path):
+            library.add(name, np.load(path))
+    library.save()
+else:
+    library = ClimbLibrary(args['index'])
+
+
+## Search for similar climbs
+landmarks = np.load(f'./video_output/{args["query"]}/landmarks.npy')
+results = library.query(landmarks, k=int(args['results'])+1, rerank=args['rerank'] == True)
+print(f'Climbs similar to {args["query"]}:')
+for name, dist in [r for r in results if r[0] != args['query']][:int(args['results'])]:
+    print(f'{name}: {dist:.3f}')
@@ -0,0 +1,124 @@
+### JIT-compiled per-frame climbing metrics
+
+## Setup
+import numpy as np
+from numba import njit
+
+# index of each metric in the metric arrays
+RIGHT_ARM, LEFT_ARM, RIGHT_LEG, LEFT_LEG = 0, 1, 2, 3
+RIGHT_HAND, LEFT_HAND, RIGHT_FOOT, LEFT_FOOT = 4, 5, 6, 7
+NUM_METRICS = 8
+
+# mediapipe ids of the (start, end) of each limb and of each tracked hand / foot point
+LIMBS = np.array([[12, 16], [11, 15], [24, 28], [23, 27]])
+EXTREMITIES = np.array([20, 19, 32, 31])
+
+@njit(cache=True)
+def limbLengths(world, raw):
+    """Euclidean shoulder-hand and hip-foot lengths from world coordinates"""
+    for m in range(4):
+        a = world[LIMBS[m, 0]]
+        b = world[LIMBS[m, 1]]
+        raw[m] = np.sqrt((a[0] - b[0])**2 + (a[1] - b[1])**2 + (a[2] - b[2])**2)
+
+@njit(cache=True)
+def pixelVelocities(pixels, prevPixels, fps, raw):
+    """Hand and foot speeds in pixels per second"""
+    for m in range(4):
+        p = EXTREMITIES[m]
+        raw[4+m] = np.sqrt((pixels[p, 0] - prevPixels[p, 0])**2 + (pixels[p, 1] - prevPixels[p, 1])**2) * fps
+
+@njit(cache=True)
+def centerGravity(pixels, cog):
+    """Midpoint of the shoulder and hip midpoints in pixel coordinates"""
+    cog[0] = int(((pixels[12, 0] + pixels[11, 0])/2 + (pixels[24, 0] + pixels[23, 0])/2) / 2)
+    cog[1] = int(((pixels[12, 1] + pixels[11, 1])/2 + (pixels[24, 1] + pixels[23, 1])/2) / 2)
+
+@njit(cache=True)
+def updateMetrics(world, pixels, fps, raw, prevPixels, buf, sums, state, smoothed, cog):
+    """
+    Updates every metric for one frame in O(1)
+
+    Parameters
+    ----------
+    world : numpy.ndarray
+        (33, 3) world coordinates of the frame, nan if no pose was found
+    pixels : numpy.ndarray
+        (33, 2) pixel coordinates of the frame, nan if no pose was found
+    fps : float
+        frame rate of the video
+    raw, prevPixels, buf, sums, state :
+        state arrays owned by MetricTracker
+    smoothed : numpy.ndarray
+        (NUM_METRICS,) output of the rolling means
+    cog : numpy.ndarray
+        (2,) output center of gravity, unchanged if no pose was found
+    """
+    # raw metrics, holding the previous value on frames without a pose
+    if not np.isnan(world[0, 0]):
+        limbLengths(world, raw)
+    if not np.isnan(pixels[0, 0]):
+        if state[2]:
+            pixelVelocities(pixels, prevPixels, fps, raw)
+        centerGravity(pixels, cog)
+        prevPixels[:] = pixels
+        state[2] = 1
+    else:
+        state[2] = 0
+
+    # rolling mean of the previous window frames, ring buffer keeps a running sum
+    window = buf.shape[0]
+    pos = state[0]
+    for m in range(NUM_METRICS):
+        if state[1] < window:
+            smoothed[m] = raw[m]
+        else:
+            smoothed[m] = sums[m] / window
+        sums[m] += raw[m] - buf[pos, m]
+        buf[pos, m] = raw[m]
+    state[0] = (pos + 1) % window
+    state[1] += 1
+
+class MetricTracker:
+    """
+    Keeps the climbing metrics up to date one frame at a time
+
+    Attributes
+    ----------
+    fps : float
+        frame rate of the video, from cv2.CAP_PROP_FPS (default=30)
+    window : int
+        number of frames in the rolling mean (default=3)
+    """
+    def __init__(self, fps=30, window=3):
+        self.fps = float(fps)
+        self.window = max(int(window), 1)
+
+        self.raw = np.zeros(NUM_METRICS)
+        self.prevPixels = np.zeros((33, 2))
+        self.buf = np.zeros((self.window, NUM_METRICS))
+        self.sums = np.zeros(NUM_METRICS)
+        self.state = np.zeros(3, dtype=np.int64) # ring position, frames seen, previous frame had a pose
+        self.smoothed = np.zeros(NUM_METRICS)
+        self.cog = np.zeros(2, dtype=np.int64)
+
+    def update(self, world, pixels):
+        """
+        Add a frame
+
+        Parameters
+        ----------
+        world : numpy.ndarray
+            (33, 3) float64 world coordinates, nan if no pose was found
+        pixels : numpy.ndarray
+            (33, 2) float64 pixel coordinates, nan if no pose was found
+
+        Output
+        ------
+        smoothed : numpy.ndarray
+            (NUM_METRICS,) rolling means of each metric, overwritten on the next update
+        cog : numpy.ndarray
+            (2,) center of gravity pixel, from the last frame with a pose
+        """
+        updateMetrics(world, pixels, self.fps, self.raw, self.prevPixels, self.buf, self.sums, self.state, self.smoothed, self.cog)
+        return self.smoothed, self.cog
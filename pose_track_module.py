@@ -4,6 +4,8 @@
 import cv2
 import mediapipe as mp
 import time
+import numpy as np
+from metric_kernels import MetricTracker
 
 class poseDetector():
     """
@@ -132,12 +134,25 @@ def main():
     ptime = 0 # initialize variable to find fps
 
     detector = poseDetector()
+    tracker = MetricTracker(cap.get(cv2.CAP_PROP_FPS) or 30)
+    world = np.full((33, 3), np.nan)
+    pixels = np.full((33, 2), np.nan)
     
     while True:
         success, img = cap.read()
         img = detector.findPose(img)
         lmList = detector.findPosition(img)
 
+        # update metrics with the world landmarks from the same inference
+        world[:] = np.nan
+        pixels[:] = np.nan
+        if lmList != []:
+            world[:] = [[lm.x, lm.y, lm.z] for lm in detector.results.pose_world_landmarks.landmark]
+            pixels[:] = [lm[1:3] for lm in lmList]
+        metrics, cog = tracker.update(world, pixels)
+        if lmList != []:
+            cv2.circle(img, (int(cog[0]), int(cog[1])), radius=10, color=(6, 6, 199), thickness=-1)
+
         # find fps
         ctime = time.time()
         fps = 1/(ctime-ptime)